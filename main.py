@@ -1,50 +1,67 @@
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import numpy as np
 import typer
-from src.utils.color_quantizer import quantize_image
-from src.utils.mask_builder import masks_from_quantized
-from src.utils.svg_exporter import masks_to_svgs
+from src.utils.color_quantizer import load_rgba, quantize_image
+from src.utils.svg_exporter import label_map_to_svgs
 from src.utils.utils import ensure_out_dir
 from src.models import POKEMON_NAMES
 
 
 def make_stencils(
     *,
-    input_path: Path,
+    image: np.ndarray,
     output_dir: Path,
     base_filename: str,
     max_colors: int,
     scale: int,
 ):
-    """Convert *input_path* PNG into ≤ *max_colors* SVG layers in *output_dir*."""
+    """Convert the decoded RGBA *image* into ≤ *max_colors* SVG layers in *output_dir*."""
     ensure_out_dir(output_dir)
 
     typer.secho(f"Quantizing image", fg=typer.colors.WHITE)
-    label_map, rgba_palette = quantize_image(input_path, max_colors)
-    typer.secho(f"Creating masks", fg=typer.colors.WHITE)
-    masks = masks_from_quantized(label_map, rgba_palette)
+    label_map, rgba_palette = quantize_image(image, max_colors)
     typer.secho(f"Creating SVGS", fg=typer.colors.WHITE)
-    masks_to_svgs(masks, rgba_palette, output_dir, scale, base_filename)
-    typer.secho(f"✅  Wrote {len(rgba_palette)} SVG layer(s) to «{output_dir}»", fg=typer.colors.GREEN)
+    written = label_map_to_svgs(label_map, rgba_palette, output_dir, scale, base_filename)
+    typer.secho(f"✅  Wrote {written} SVG layer(s) to «{output_dir}»", fg=typer.colors.GREEN)
+
+
+def _stencil_sprite(job: tuple[Path, np.ndarray]) -> None:
+    """Make the stencils for one decoded sprite, named after its Pokédex number."""
+    input_path, image = job
+    typer.secho(f"Making stencils for {input_path.name}")
+    file_stem = input_path.stem
+    num = int(file_stem.rpartition("_")[2])
+    name = POKEMON_NAMES.get(num, f"pokemon{num}")
+    base_filename = f"{num:03}_{name}"
+    output_dir = Path(f"./art/pokemon-gold/svgs/{base_filename}")
+    make_stencils(
+        image=image,
+        output_dir=output_dir,
+        base_filename=base_filename,
+        max_colors=4,
+        scale=10,
+    )
 
 
 if __name__ == "__main__":  # pragma: no cover
     input_dir = Path("./art/pokemon-gold/test")
+    input_paths = list(input_dir.glob("*.png"))
+
+    processes = min(os.cpu_count() or 1, len(input_paths))
+    if processes <= 1:
+        # Stay in-process so errors surface with a plain traceback
+        for input_path in input_paths:
+            _stencil_sprite((input_path, load_rgba(input_path)))
+    else:
+        # Fork the workers before any decoder thread exists; sprites are independent
+        # and each writes to its own output dir
+        with multiprocessing.Pool(processes=processes) as pool, ThreadPoolExecutor() as decoder:
+            # PNGs decode on I/O threads (Pillow releases the GIL) while the workers stencil
+            jobs = zip(input_paths, decoder.map(load_rgba, input_paths))
+            for _ in pool.imap_unordered(_stencil_sprite, jobs):
+                pass
 
-    total = 0
-    for i, input_path in enumerate(input_dir.glob("*.png")):
-        typer.secho(f"Making stencils for #{i+1}")
-        file_stem = input_path.stem
-        num = int(file_stem.split("_")[-1])
-        name = POKEMON_NAMES.get(num, f"pokemon{num}")
-        base_filename = f"{num:03}_{name}"
-        output_dir = Path(f"./art/pokemon-gold/svgs/{base_filename}")
-        make_stencils(
-            input_path=Path(input_path),
-            output_dir=output_dir,
-            base_filename=base_filename,
-            max_colors=4,
-            scale=10,
-        )
-        total += 1
-
-    typer.secho(f"✅ Converted {total} PNGS -> SVGs", fg=typer.colors.GREEN, bold=True)
+    typer.secho(f"✅ Converted {len(input_paths)} PNGS -> SVGs", fg=typer.colors.GREEN, bold=True)
@@ -2,32 +2,60 @@ from pathlib import Path
 from typing import Tuple
 from PIL import Image
 import numpy as np
-from sklearn.cluster import KMeans
 
-from src.models.models import RGBA, RGB
+from src.models.models import RGBA
 
 
-def quantize_image(img_path: Path, k: int, alpha_threshold: int = 10) -> Tuple[np.ndarray, list[RGBA]]:
+def load_rgba(img_path: Path) -> np.ndarray:
+    """Decode *img_path* into an (H, W, 4) uint8 RGBA array."""
+    with Image.open(img_path) as img:
+        # Only pay for a converted copy when the PNG is not RGBA already
+        img_rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+        return np.asarray(img_rgba)
+
+
+def quantize_image(arr: np.ndarray, k: int, alpha_threshold: int = 10) -> Tuple[np.ndarray, list[RGBA]]:
     """
-    Load *img_path*, convert to RGBA, quantize only opaque pixels to exactly k colours, return:
+    Quantize only the opaque pixels of the (H, W, 4) RGBA image *arr* to at most k colours, return:
       - the 2D label map (index map) of shape (H, W), where each value is 0..k-1 for opaque pixels, -1 for transparent
-      - the RGBA palette as a list of k used colours (w/ real alpha)
+      - the RGBA palette as a list of the used colours (w/ real alpha)
     Transparent (or nearly transparent) pixels are ignored in quantization and marked as -1 in the label map.
     """
-    img_rgba = Image.open(img_path).convert("RGBA")
-    arr = np.array(img_rgba)
     # Mask for opaque pixels
     opaque_mask = arr[..., 3] >= alpha_threshold
     opaque_pixels = arr[opaque_mask][..., :3]  # shape (N, 3)
     if len(opaque_pixels) == 0:
         raise ValueError("No opaque pixels found in image.")
-    # KMeans quantization
-    kmeans = KMeans(n_clusters=k, n_init=10, random_state=42)
-    labels = kmeans.fit_predict(opaque_pixels)
-    palette = kmeans.cluster_centers_.astype(np.uint8)
-    # Build RGBA palette (all opaque)
-    rgba_palette: list[RGBA] = [(int(r), int(g), int(b), 255) for r, g, b in palette]
+    # Octree quantization of the opaque pixels only, laid out as a 1 x N strip so
+    # transparent pixels never claim a palette slot
+    strip = Image.fromarray(opaque_pixels[None, :, :])
+    colors = strip.getcolors(maxcolors=k)  # None when there are more than k colours
+    if colors is not None:
+        # Already fits (typical for pixel art): keep the exact colours, skip the quantizer
+        palette = np.array([rgb for _, rgb in colors], dtype=np.uint8)  # (n, 3)
+        palette_keys = _pack_rgb(palette)
+        order = np.argsort(palette_keys)
+        labels = order[np.searchsorted(palette_keys[order], _pack_rgb(opaque_pixels))]
+    else:
+        img_q = strip.quantize(colors=k, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        raw_palette = np.array(img_q.getpalette(), dtype=np.uint8).reshape(-1, 3)
+        # Octree may leave some slots empty; compact the used ones to 0..n-1
+        used_indexes, labels = np.unique(np.array(img_q, dtype=np.int32).ravel(), return_inverse=True)
+        palette = raw_palette[used_indexes]
+    # Average alpha per cluster: two bincount passes instead of a full-image scan per label
+    alphas = arr[..., 3][opaque_mask].astype(np.int32)
+    sums = np.bincount(labels, weights=alphas, minlength=len(palette))
+    counts = np.bincount(labels, minlength=len(palette))
+    avg_alpha = np.where(counts > 0, sums // np.maximum(counts, 1), 255).astype(np.uint8)
+    # Build RGBA palette (w/ real alpha)
+    rgba_palette: list[RGBA] = [tuple(rgba) for rgba in np.column_stack([palette, avg_alpha]).tolist()]
     # Build 2D label map, -1 for transparent
     label_map = np.full(arr.shape[:2], fill_value=-1, dtype=np.int32)
     label_map[opaque_mask] = labels
     return label_map, rgba_palette
+
+
+def _pack_rgb(pixels: np.ndarray) -> np.ndarray:
+    """Pack an (N, 3) uint8 array of RGB triples into (N,) uint32 keys."""
+    pixels = pixels.astype(np.uint32)
+    return (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
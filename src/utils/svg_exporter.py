@@ -1,54 +1,241 @@
+import io
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable
-import svgwrite
+from typing import Literal
+import numpy as np
 
 from src.models.models import RGB, RGBA
 
+Point = tuple[int, int]
+Loop = np.ndarray  # (N, 2) int32 corner coordinates, one row per vertex
 
-def masks_to_svgs(
-    masks: Iterable,
+# Unit steps (dx, dy) a boundary can take from a corner, indexed by direction
+_DIRECTIONS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+_NORTH, _EAST, _SOUTH, _WEST = range(4)
+# Offset (dx, dy) from an edge's start corner to the pixel on its right, by heading
+_RIGHT_PIXEL = np.array([(0, -1), (0, 0), (-1, 0), (-1, -1)])
+
+
+def label_map_to_svgs(
+    label_map: np.ndarray,
     rgba_palette: list[RGBA],
     out_dir: Path,
     scale: int,
     base_filename: str,
-):
+) -> int:
     """
-    Convert each mask into an SVG where every 'true' pixel becomes a <rect>.
-    A more sophisticated implementation could flood-fill contiguous pixels
-    and emit <path>s; this keeps dependencies light.
+    Convert each colour of the quantized *label_map* (palette index per pixel,
+    -1 for transparent) into an SVG holding a single compound <path>.
+    The outline of every contiguous region (and of every hole inside one) is
+    traced along pixel edges; the even-odd fill rule carves the holes back out.
+    All layers are traced in one pass, so neighbouring outlines match exactly.
+    Colours that share a label (e.g. two near-whites) are merged into one layer.
+    Empty layers are skipped. Returns the number of SVG files written.
     """
-    height, width = masks[0].shape
-    size_px = (width * scale, height * scale)
+    layers = _label_palette(rgba_palette)
+    # Renumber palette indexes to output files, merging colours that share a label;
+    # a merged layer takes the fill of its last colour
+    fills = {colour_label: colour_hex for colour_label, colour_hex in layers}
+    file_index = {colour_label: i for i, colour_label in enumerate(fills)}
+    layer_of = [file_index[colour_label] if rgba[3] > 0 else -1 for (colour_label, _), rgba in zip(layers, rgba_palette)]
+    # The trailing -1 is what transparent pixels (label -1) index into
+    layer_map = np.array(layer_of + [-1], dtype=np.int32)[label_map]
 
-    other_index = 1
-    for mask, rgba in zip(masks, rgba_palette):
-        rgb: RGB = rgba[:3]
-        colour_label, other_index = _get_color_name(rgb, other_index)
-        dwg = svgwrite.Drawing(
-            filename=str(out_dir / f"{base_filename}_{colour_label}.svg"),
-            size=size_px,
-            viewBox=f"0 0 {width} {height}",  # avoids bloated coordinate space
+    rows = np.flatnonzero((layer_map >= 0).any(axis=1))
+    if len(rows) == 0:
+        return 0
+    # Only trace the tight bounding box of the opaque pixels
+    cols = np.flatnonzero((layer_map >= 0).any(axis=0))
+    y0, y1 = int(rows[0]), int(rows[-1]) + 1
+    x0, x1 = int(cols[0]), int(cols[-1]) + 1
+    loops_by_layer = _trace_label_edges(layer_map[y0:y1, x0:x1], offset=(x0, y0))
+
+    height, width = label_map.shape
+    written = 0
+    for i, (colour_label, colour_hex) in enumerate(fills.items()):
+        loops = loops_by_layer.get(i)
+        if not loops:
+            continue
+        path_d = _loops_to_path_d(loops)
+        _write_svg(out_dir / f"{base_filename}_{colour_label}.svg", width, height, scale, path_d, colour_hex)
+        written += 1
+    return written
+
+
+def _write_svg(path: Path, width: int, height: int, scale: int, path_d: str, fill: str) -> None:
+    """Stream a fixed <svg><path/></svg> document to *path* without building a DOM."""
+    with path.open("w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+        f.write(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width * scale}" height="{height * scale}" '
+            f'viewBox="0 0 {width} {height}">'  # avoids bloated coordinate space
         )
-        # dwg.add(dwg.rect(insert=(0, 0), size=(width, height), fill="none"))  # bounding box
+        # The path data is the bulk of the file; write it as-is rather than copying it into a template
+        f.write('<path d="')
+        f.write(path_d)
+        f.write(f'" fill="{fill}" fill-rule="evenodd"/>')
+        f.write("</svg>\n")
+
+
+def _loops_to_path_d(loops: list[Loop]) -> str:
+    """Format *loops* as an SVG path ``d`` string, one closed sub-path per loop."""
+    buf = io.StringIO()
+    for loop in loops:
+        if buf.tell():
+            buf.write(" ")
+        # One %-format over the flattened coordinates instead of one per vertex
+        template = "M %d %d" + " L %d %d" * (len(loop) - 1) + " Z"
+        buf.write(template % tuple(loop.ravel().tolist()))
+    return buf.getvalue()
+
+
+def _trace_label_edges(labels: np.ndarray, offset: Point = (0, 0)) -> dict[int, list[Loop]]:
+    """Walk the pixel-edge boundaries of every layer of *labels* into closed loops of turning corner points.
+
+    Returns the loops of each label >= 0, keyed by label; negative labels are
+    background. Corner (x, y) is the top-left corner of pixel (x, y). Every
+    edge separating a pixel from one with another label (or from outside the
+    image) belongs to the pixel on its right and is used by exactly one loop,
+    so each layer's loops render it exactly under the even-odd fill rule.
+    Loops run clockwise around filled regions and counter-clockwise around
+    holes. (cv2.findContours would trace through pixel centres instead,
+    shaving half a pixel off every outline.) *offset* is added to every
+    emitted corner.
+    """
+    height, width = labels.shape
+    padded = np.full((height + 2, width + 2), -1, dtype=labels.dtype)
+    padded[1:-1, 1:-1] = labels
+    inside = padded[1:-1, 1:-1]
+    # dirs[y, x, d] is set when a boundary edge leaves corner (x, y) heading d.
+    # Each exposed side of a pixel is one edge, directed clockwise around that
+    # pixel's layer, and owns exactly one slot of a shifted view; one table
+    # holds the edges of every layer.
+    dirs = np.zeros((height + 1, width + 1, len(_DIRECTIONS)), dtype=bool)
+    planes = (
+        (dirs[:-1, :-1, _EAST], padded[:-2, 1:-1]),  # top: (x, y) -> (x + 1, y)
+        (dirs[:-1, 1:, _SOUTH], padded[1:-1, 2:]),  # right: (x + 1, y) -> (x + 1, y + 1)
+        (dirs[1:, 1:, _WEST], padded[2:, 1:-1]),  # bottom: (x + 1, y + 1) -> (x, y + 1)
+        (dirs[1:, :-1, _NORTH], padded[1:-1, :-2]),  # left: (x, y + 1) -> (x, y)
+    )
+    filled = inside >= 0
+    for plane, neighbour in planes:
+        np.not_equal(inside, neighbour, out=plane)
+        plane &= filled  # background pixels own no edges
+
+    stride = width + 1
+    slots, loop_ends = _walk_edges(dirs)
+    # Each loop belongs to the label of the pixel right of its first edge
+    starts = slots[[0] + loop_ends[:-1]]
+    corners, headings = np.divmod(starts, 4)
+    ys, xs = np.divmod(corners, stride)
+    owners = inside[ys + _RIGHT_PIXEL[headings, 1], xs + _RIGHT_PIXEL[headings, 0]].tolist()
+
+    loops_by_label: dict[int, list[Loop]] = {}
+    for owner, loop in zip(owners, _split_loops(slots, loop_ends, stride, offset)):
+        loops_by_label.setdefault(owner, []).append(loop)
+    return loops_by_label
 
-        colour_hex = "#%02x%02x%02x" % rgb
-        for y, row in enumerate(mask):
-            for x, on in enumerate(row):
-                if on:
-                    dwg.add(dwg.rect(insert=(x, y), size=(1, 1), fill=colour_hex))
 
-        dwg.save()
+def _walk_edges(dirs: np.ndarray) -> tuple[np.ndarray, list[int]]:
+    """Chain the edges flagged in the corner table *dirs* into closed loops.
 
+    Returns the slot ids of every loop's edges back to back, in walk order,
+    and the end offset of each loop within them.
+    """
+    # Edges are identified by their slot id: corner * 4 + heading, with corner = y * stride + x
+    stride = dirs.shape[1]
+    steps = np.array([dy * stride + dx for dx, dy in _DIRECTIONS])
+    edge_table = dirs.ravel()
+    edges = np.flatnonzero(edge_table)
+    corners, headings = np.divmod(edges, 4)
+    ends = corners + steps[headings]
+
+    # Successor of each edge: the right-most outgoing turn at its end corner. Only
+    # pinch corners (two pixels touching diagonally) offer a choice, and turning
+    # right pairs each incoming edge with its own outgoing one, so successors form
+    # a permutation of the edges whose cycles are exactly the loops. That turn is
+    # always owned by the same layer as the incoming edge, so a walk never strays
+    # into a neighbouring layer.
+    successors = np.full(len(edges), -1)
+    for turn in (1, 0, 3):  # right, straight on, left
+        candidates = ends * 4 + (headings + turn) % 4
+        pick = (successors < 0) & edge_table[candidates]
+        successors[pick] = candidates[pick]
+    # Renumber successors as positions in the sorted edge list for a compact walk
+    next_edge = np.searchsorted(edges, successors).tolist()
+
+    # Walk the cycles, collecting every loop's edges back to back in one flat list
+    seen = bytearray(len(edges))
+    walk: list[int] = []
+    loop_ends: list[int] = []
+    first = seen.find(0)  # next unwalked edge, located by a C-level scan
+    while first != -1:
+        edge = first
+        while not seen[edge]:
+            seen[edge] = 1
+            walk.append(edge)
+            edge = next_edge[edge]
+        loop_ends.append(len(walk))
+        first = seen.find(0, first + 1)
+    return edges[walk], loop_ends
+
+
+def _split_loops(slots: np.ndarray, loop_ends: list[int], stride: int, offset: Point) -> list[Loop]:
+    """Decode walked edge slots back to corner points, shifted by *offset*, one array per loop.
+
+    Loops are axis-aligned, so only corners where the heading changes are
+    kept; the vertices along a straight run add nothing to the outline.
+    """
+    if not loop_ends:
+        return []
+    ends = np.array(loop_ends)
+    starts = np.concatenate(([0], ends[:-1]))
+    # An edge begins a new segment when it turns away from the edge before it,
+    # which for a loop's first edge is that loop's last one
+    headings = slots % 4
+    previous = np.roll(headings, 1)
+    previous[starts] = headings[ends - 1]
+    turns = headings != previous
+    slots = slots[turns]
+    ends = np.cumsum(turns)[ends - 1]
 
-def _get_color_name(rgb: tuple[int, int, int], other_index: int) -> tuple[str, int]:
-    """Return a human-friendly name for *rgb*.
+    # Each edge starts at its corner; decode all ids back to points in one go
+    points = np.empty((len(slots), 2), dtype=np.int32)
+    np.divmod(slots // 4, stride, out=(points[:, 1], points[:, 0]))
+    points += offset
+    # Loops are views into the one points array, not copies
+    return np.split(points, ends[:-1])
+
+
+def _label_palette(rgba_palette: list[RGBA]) -> list[tuple[str, str]]:
+    """Pair each palette colour's filename label with its fill hex, in palette order."""
+    colour_hexes = ["#%02x%02x%02x" % rgba[:3] for rgba in rgba_palette]
+    return list(zip(_get_color_names(rgba_palette), colour_hexes))
+
+
+def _get_color_names(rgba_palette: list[RGBA]) -> list[str]:
+    """Return a human-friendly name for every colour in *rgba_palette*.
 
     Values close to pure white or black are labeled accordingly to make the
-    generated filenames predictable.
+    generated filenames predictable; the rest are numbered color1, color2, ...
     """
+    names = []
+    other_index = 1
+    for rgba in rgba_palette:
+        name = _classify_color(rgba[:3])
+        if name == "other":
+            name = f"color{other_index}"
+            other_index += 1
+        names.append(name)
+    return names
+
+
+@lru_cache(maxsize=256)
+def _classify_color(rgb: RGB) -> Literal["white", "black", "other"]:
+    """Bucket *rgb* as near-white, near-black or neither; palettes repeat, so results are cached."""
     color_tolerance = 10
-    if all(abs(c - 255) <= color_tolerance for c in rgb):
-        return "white", other_index
-    if all(abs(c) <= color_tolerance for c in rgb):
-        return "black", other_index
-    return f"color{other_index}", other_index + 1
\ No newline at end of file
+    if min(rgb) >= 255 - color_tolerance:
+        return "white"
+    if max(rgb) <= color_tolerance:
+        return "black"
+    return "other"